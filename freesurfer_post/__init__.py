@@ -4,6 +4,23 @@ A Python package for post-processing FreeSurfer outputs with modern
 neuroimaging analysis capabilities.
 """
 
+import importlib
+
 __version__ = '0.1.0'
 __author__ = 'Your Name'
 __email__ = 'your.email@example.com'
+
+_SUBMODULES = {'cli', 'interfaces', 'utils', 'workflows'}
+
+
+def __getattr__(name):
+    """Import submodules on first access.
+
+    Most of them pull in nipype and pandas, so ``import freesurfer_post``
+    stays cheap until one is actually used.
+    """
+    if name in _SUBMODULES:
+        module = importlib.import_module(f'.{name}', __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
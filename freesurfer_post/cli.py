@@ -4,7 +4,22 @@ import click
 
 from . import __version__
 from .utils import find_freesurfer_dir
-from .workflows import build_workflow
+
+
+def _validate_atlases(_ctx, _param, value):
+    """Check --atlases against the known parcellations before any work is done."""
+    if not value:
+        return None
+
+    # Only pay for importing the workflows when atlases were requested
+    from .workflows import AVAILABLE_PARCELLATIONS, NATIVE_PARCELLATIONS
+
+    unknown_atlases = sorted(
+        set(value).difference(AVAILABLE_PARCELLATIONS + NATIVE_PARCELLATIONS)
+    )
+    if unknown_atlases:
+        raise click.BadParameter(f'unknown atlases: {", ".join(unknown_atlases)}')
+    return value
 
 
 @click.command()
@@ -18,6 +33,24 @@ from .workflows import build_workflow
 @click.option('--session-id', '-x', help='Session ID to process')
 @click.option('--working-dir', '-w', help='Path to working directory')
 @click.option('--fs-license-file', '-l', help='Path to license file')
+@click.option(
+    '--omp-nthreads',
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help='Number of OpenMP threads for each FreeSurfer command',
+)
+@click.option(
+    '--atlases',
+    multiple=True,
+    callback=_validate_atlases,
+    help='Parcellation to process (may be repeated). Defaults to all parcellations',
+)
+@click.option(
+    '--reuse-existing',
+    is_flag=True,
+    help='Reuse stats and annots from a previous run if newer than the surfaces',
+)
 def main(
     verbose,
     input_path,
@@ -28,6 +61,9 @@ def main(
     session_id,
     working_dir,
     fs_license_file,
+    omp_nthreads,
+    atlases,
+    reuse_existing,
 ):
     """FreeSurfer Post-processing Tools.
 
@@ -54,12 +90,18 @@ def main(
     click.echo(f'Working directory: {working_dir}')
     click.echo(f'FreeSurfer license file: {fs_license_file}')
 
+    # Importing nipype is slow, so only do it once we know we need a workflow
+    from .workflows import build_workflow
+
     workflow = build_workflow(
         subject_id=subject_id,
         session_id=session_id,
         subject_freesurfer_dir=subject_fs_dir,
         output_dir=output_path,
         working_dir=working_dir,
+        omp_nthreads=omp_nthreads,
+        atlases=atlases,
+        reuse_existing=reuse_existing,
     )
 
     import os
@@ -1,2 +1,7 @@
-from .interfaces import SurfStatsMetadata  # noqa: F401
-from .tabular import FSStats, SummarizeRegionStats  # noqa: F401
+from .interfaces import SurfStatsMetadata, WarmPageCache  # noqa: F401
+from .tabular import (  # noqa: F401
+    FSStats,
+    SummarizeRegionStats,
+    run_fs_stats,
+    run_region_stats,
+)
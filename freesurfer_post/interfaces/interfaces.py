@@ -4,6 +4,17 @@ from pathlib import Path
 
 from nipype.interfaces.base import SimpleInterface, TraitedSpec, traits
 
+# The metadata is static package data, so parse and sort it once at import
+_SURFSTATS_JSON = json.dumps(
+    json.loads(
+        resources.files('freesurfer_post.data')
+        .joinpath('surfacestats.json')
+        .read_bytes()
+    ),
+    indent=2,
+    sort_keys=True,
+)
+
 
 class _SurfStatsMetadataInputSpec(TraitedSpec):
     output_dir = traits.Directory(
@@ -35,14 +46,50 @@ class SurfStatsMetadata(SimpleInterface):
             / f'{self.inputs.subject_id}_surfacestats.json'
         )
 
-        with (
-            resources.files('freesurfer_post.data')
-            .joinpath('surfacestats.json')
-            .open('r') as f
-        ):
-            data = json.load(f)
-            with open(out_file, 'w') as out_f:
-                json.dump(data, out_f, indent=2, sort_keys=True)
+        # Nothing else is guaranteed to have created the subject's directory yet
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        out_file.write_text(_SURFSTATS_JSON)
         self._results['out_file'] = str(out_file)
 
         return runtime
+
+
+class _WarmPageCacheInputSpec(TraitedSpec):
+    in_files = traits.List(
+        traits.File(exists=True),
+        desc='Files to read into the page cache',
+        mandatory=True,
+    )
+    subjects_dir = traits.Directory(
+        desc='FreeSurfer subjects directory, passed through to the output',
+        mandatory=True,
+    )
+
+
+class _WarmPageCacheOutputSpec(TraitedSpec):
+    subjects_dir = traits.Directory(
+        desc='FreeSurfer subjects directory',
+    )
+
+
+class WarmPageCache(SimpleInterface):
+    """Read files once so that later nodes find them in the OS page cache.
+
+    Nodes that take ``subjects_dir`` from this interface wait until the
+    files have been read, so they start from a warm cache instead of each
+    reading the same files from a cold (e.g. network) filesystem.
+    """
+
+    input_spec = _WarmPageCacheInputSpec
+    output_spec = _WarmPageCacheOutputSpec
+
+    def _run_interface(self, runtime):
+        buffer = bytearray(1 << 20)
+        for in_file in self.inputs.in_files:
+            with open(in_file, 'rb', buffering=0) as fobj:
+                while fobj.readinto(buffer):
+                    pass
+
+        self._results['subjects_dir'] = self.inputs.subjects_dir
+
+        return runtime
@@ -1,5 +1,9 @@
+import csv
+import io
 import json
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import product, repeat
 from pathlib import Path
 
 import numpy as np
@@ -12,6 +16,14 @@ from ..utils import find_freesurfer_dir
 
 hemispheres = ['lh', 'rh']
 NOSUFFIX_COLS = ['Index', 'SegId', 'StructName']
+# Used with str.lower() to convert names to snake case
+SNAKE_CASE_TABLE = str.maketrans({'-': '_', '.': '_'})
+COLHEADERS_PATTERN = re.compile(r'^# ColHeaders ', re.MULTILINE)
+# recon-all.log lines with the euler numbers and holes start with this
+QC_LINE_PREFIX = 'orig.nofix '
+MEASURE_PATTERN = re.compile(
+    r'# Measure ([A-Za-z]+), ([A-Za-z]+),* [-A-Za-z ]+, ([0-9.]+), .*'
+)
 
 ASEG_STATS_METADATA = {
     'participant_id': {'Description': 'BIDS participant ID'},
@@ -31,26 +43,36 @@ ASEG_STATS_METADATA = {
     'normmax': {'Description': 'Normalized maximum. Originally normMax.'},
     'normrange': {'Description': 'Normalized range. Originally normRange.'},
 }
+# The aseg sidecar never changes, so only serialize it once
+ASEG_STATS_METADATA_JSON = json.dumps(ASEG_STATS_METADATA, indent=2, sort_keys=True)
 
 
 def statsfile_to_df(stats_fname, hemi, atlas, column_suffix=''):
-    with open(stats_fname) as fo:
-        data = fo.readlines()
-
-    idx = [i for i, line in enumerate(data) if line.startswith('# ColHeaders ')]
-    assert len(idx) == 1
-    idx = idx[0]
-
-    columns_row = data[idx]
-    actual_data = data[idx + 1 :]
-    actual_data = [line.split() for line in actual_data]
-    columns = columns_row.replace('# ColHeaders ', '').split()
-
-    df = pd.DataFrame(
-        columns=[
-            col + column_suffix if col not in NOSUFFIX_COLS else col for col in columns
-        ],
-        data=actual_data,
+    text = Path(stats_fname).read_text()
+
+    # Find the header row without splitting the file into lines: the table
+    # is everything after it
+    header_match = COLHEADERS_PATTERN.search(text)
+    assert header_match is not None
+    header_end = text.find('\n', header_match.end())
+    if header_end == -1:
+        header_end = len(text)
+
+    columns = [
+        col if col in NOSUFFIX_COLS else col + column_suffix
+        for col in text[header_match.end() : header_end].split()
+    ]
+
+    # Let the C parser tokenize the table and convert the measurement columns
+    # to numbers in one go. The identifying columns are kept as strings.
+    df = pd.read_csv(
+        io.StringIO(text[header_end + 1 :]),
+        sep=r'\s+',
+        comment='#',
+        header=None,
+        names=columns,
+        dtype={col: str for col in NOSUFFIX_COLS if col in columns},
+        engine='c',
     )
     df.insert(0, 'hemisphere', hemi)
     df.insert(0, 'atlas', atlas)
@@ -118,17 +140,41 @@ class SummarizeRegionStats(SimpleInterface):
         atlas = self.inputs.atlas_name
         surfstat_dfs = []
 
+        # The four stats files are independent, so read them concurrently
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {}
+            for hemi in hemispheres:
+                # Get the surface statistics
+                surfstats_file = getattr(self.inputs, f'{hemi}_stats_file')
+                # get the g-w.pct files
+                gwr_stats_file = getattr(self.inputs, f'{hemi}_gwr_stats_file')
+                futures[hemi] = (
+                    executor.submit(statsfile_to_df, surfstats_file, hemi, atlas),
+                    executor.submit(
+                        statsfile_to_df, gwr_stats_file, hemi, atlas, '_wgpct'
+                    ),
+                )
+
         for hemi in hemispheres:
-            # Get the surface statistics
-            surfstats_file = getattr(self.inputs, f'{hemi}_stats_file')
-            surfstat_df_ = statsfile_to_df(surfstats_file, hemi, atlas)
-
-            # get the g-w.pct files
-            gwr_stats_file = getattr(self.inputs, f'{hemi}_gwr_stats_file')
-            gwpct_df_ = statsfile_to_df(
-                gwr_stats_file, hemi, atlas, column_suffix='_wgpct'
-            )
-            surfstat_dfs.append(pd.merge(surfstat_df_, gwpct_df_))
+            surfstat_future, gwpct_future = futures[hemi]
+            surfstat_df_ = surfstat_future.result()
+            gwpct_df_ = gwpct_future.result()
+            if surfstat_df_['StructName'].equals(gwpct_df_['StructName']):
+                # Both tables list the same regions in the same order, so
+                # line them up side by side instead of doing a hash join
+                surfstat_dfs.append(
+                    pd.concat(
+                        [
+                            surfstat_df_,
+                            gwpct_df_.drop(
+                                columns=['atlas', 'hemisphere', 'StructName']
+                            ),
+                        ],
+                        axis=1,
+                    )
+                )
+            else:
+                surfstat_dfs.append(pd.merge(surfstat_df_, gwpct_df_))
 
         out_df = pd.concat(surfstat_dfs, axis=0, ignore_index=True)
 
@@ -140,11 +186,18 @@ class SummarizeRegionStats(SimpleInterface):
         out_df.insert(0, 'subject_id', self.inputs.subject_id)
 
         def sanity_check_columns(reference_column, redundant_column, atol=0):
-            if not np.allclose(
-                out_df[reference_column].astype(np.float32),
-                out_df[redundant_column].astype(np.float32),
-                atol=atol,
-            ):
+            if atol == 0:
+                # Exact checks are for integer counts, compare them as integers
+                identical = np.array_equal(
+                    out_df[reference_column].to_numpy(dtype=np.int64),
+                    out_df[redundant_column].to_numpy(dtype=np.int64),
+                )
+            else:
+                # Only an absolute tolerance is wanted, so skip allclose's rtol term
+                reference = out_df[reference_column].to_numpy(dtype=np.float32)
+                redundant = out_df[redundant_column].to_numpy(dtype=np.float32)
+                identical = bool((np.abs(reference - redundant) <= atol).all())
+            if not identical:
                 raise Exception(
                     f'The {reference_column} values were not identical to {redundant_column}'
                 )
@@ -163,34 +216,58 @@ class SummarizeRegionStats(SimpleInterface):
 
         # Convert column names to snake case
         out_df.columns = [
-            col.lower().replace('-', '_').replace('.', '_') for col in out_df.columns
+            col.lower().translate(SNAKE_CASE_TABLE) for col in out_df.columns
         ]
         # Rename subject_id to participant_id
         out_df = out_df.rename(columns={'subject_id': 'participant_id'})
         # Reorder columns to have participant_id first
-        cols = out_df.columns.tolist()
-        cols.remove('participant_id')
-        out_df = out_df[['participant_id'] + cols]
-        # Replace missing values with "n/a"
-        out_df = out_df.fillna('n/a')
+        out_df.insert(0, 'participant_id', out_df.pop('participant_id'))
 
-        # Save data
+        # Save data, writing missing values as "n/a"
         out_df.to_csv(
             output_dir / f'{output_prefix}_seg-{cleaned_atlas_name}_surfacestats.tsv',
             sep='\t',
+            na_rep='n/a',
             index=False,
         )
         return runtime
 
 
+def tsv_cell(value):
+    """Get a value ready for csv.writer, which calls str() on every cell.
+
+    Missing values become "n/a" and numpy scalars become plain Python numbers,
+    so the cells match what pandas would write.
+    """
+    if pd.isna(value):
+        return 'n/a'
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
 def get_euler_from_log(reconlog):
+    # Stream the log to find both QC lines in one pass. recon-all logs can
+    # be large, so don't hold the whole thing in memory. Each line must appear
+    # exactly once: a log with several recon-all runs in it is ambiguous. That
+    # means reading to the end, so most lines are skipped by a prefix check.
+    qc_lines = {'lheno': None, 'lhholes': None}
     with reconlog.open('r') as reconlogf:
-        log_lines = [line.strip() for line in reconlogf]
+        for line in reconlogf:
+            if not line.startswith(QC_LINE_PREFIX):
+                continue
+            target_str = line[len(QC_LINE_PREFIX) :].split(maxsplit=1)[0]
+            if target_str not in qc_lines:
+                continue
+            if qc_lines[target_str] is not None:
+                raise Exception(f'{target_str} found more than once in {reconlog}')
+            qc_lines[target_str] = line
 
     def read_qc(target_str):
-        (data,) = [line for line in log_lines if target_str in line]
-        data = data.replace(',', '')
-        tokens = data.split()
+        data = qc_lines[target_str]
+        if data is None:
+            raise Exception(f'{target_str} not found in {reconlog}')
+        tokens = data.replace(',', '').split()
         rh_val = float(tokens[-1])
         lh_val = float(tokens[-4])
         return rh_val, lh_val
@@ -217,6 +294,16 @@ def get_euler_from_log(reconlog):
     }
 
 
+def clean_stats_name(name):
+    """Make a FreeSurfer structure or column name usable as a column name."""
+    return (
+        name.replace('-', '_')
+        .replace('3rd', 'Third')
+        .replace('4th', 'Fourth')
+        .replace('5th', 'Fifth')
+    )
+
+
 def read_stats(stats_file, info, get_measures=False, measures_only=False):
     """Reads stats from a freesurfer stats table.
 
@@ -229,96 +316,99 @@ def read_stats(stats_file, info, get_measures=False, measures_only=False):
         Dictionary containing other collected info about the run
     get_measures: bool
         Should the # Measure lines be parsed and added to info?
-    Returns: Nothing. the info dict gets keys/values added to it
+    measures_only: bool
+        Skip the table and only parse the # Measure lines?
+    Returns: info, with the keys/values from this file added to it
 
     """
-    with stats_file.open('r') as statsf:
-        lines = statsf.readlines()
+    lines = stats_file.read_text().splitlines()
     stats_name = stats_file.name.split('.')[0]
 
     # Get the column names by finding the line with the header tag in it
     header_tag = '# ColHeaders'
-    (header,) = [line for line in lines if header_tag in line]
+    header = next((line for line in lines if line.startswith(header_tag)), None)
+    assert header is not None
     header = header[len(header_tag) :].strip().split()
 
-    stats_df = pd.read_csv(str(stats_file), sep=r'\s+', comment='#', names=header).melt(
-        id_vars=['StructName'], ignore_index=True
-    )
-    stats_df = stats_df[stats_df['variable'] != 'Index']
-
-    if stats_name.startswith('lh'):
-        suffix = '_Left'
-    elif stats_name.startswith('rh'):
-        suffix = '_Right'
+    # Hemisphere-specific measures get a suffix, whole-brain ones don't
+    if stats_name == 'lh':
+        suffix = '_lh'
+    elif stats_name == 'rh':
+        suffix = '_rh'
     else:
-        suffix = '_Sub'
+        suffix = ''
 
     if not measures_only:
-        # Get it into a nice form
-        stats_df['FlatName'] = stats_df['StructName'] + '_' + stats_df['variable']
-
-        for _, row in stats_df.iterrows():
-            col_name = (
-                row['FlatName']
-                .replace('-', '_')
-                .replace('3rd', 'Third')
-                .replace('4th', 'Fourth')
-                .replace('5th', 'Fifth')
-            )
-            if col_name in info:
-                raise Exception(f'{col_name} is already present in the collected data')
-            info[col_name] = {
-                'value': row['value'],
-                'meta': (
-                    f'The "{row["variable"]}" value for the "{row["StructName"]}" '
-                    f'structure. Originally in the stats/{stats_name} file.'
-                ),
-            }
+        # Parse the table rows straight from the lines we already read
+        rows = [line.split() for line in lines if line.strip() and line[0] != '#']
+        table = np.array(rows, dtype=object).reshape(len(rows), len(header))
+        struct_names = table[:, header.index('StructName')]
+        # Get the names into a nice form once, rather than once per cell
+        clean_struct_names = [clean_stats_name(name) for name in struct_names]
+
+        for col_idx, variable in enumerate(header):
+            if variable in ('Index', 'StructName'):
+                continue
+            clean_variable = clean_stats_name(variable)
+            values = table[:, col_idx].astype(np.float64)
+            for struct_name, clean_struct_name, value in zip(
+                struct_names, clean_struct_names, values, strict=True
+            ):
+                col_name = f'{clean_struct_name}_{clean_variable}'
+                entry = {
+                    'value': value,
+                    'meta': (
+                        f'The "{variable}" value for the "{struct_name}" '
+                        f'structure. Originally in the stats/{stats_name} file.'
+                    ),
+                }
+                if info.setdefault(col_name, entry) is not entry:
+                    raise Exception(
+                        f'{col_name} is already present in the collected data'
+                    )
 
     if get_measures:
-        get_stat_measures(stats_file, suffix, info, stats_name)
+        get_stat_measures(lines, suffix, info, stats_name)
 
+    return info
 
-def get_stat_measures(stats_file, suffix, info, stats_name):
+
+def get_stat_measures(lines, suffix, info, stats_name):
     """Read a "Measure" from a stats file.
 
     Parameters:
     ===========
 
-    stats_file: Path
-        Path to a .stats file containing the measure you want
+    lines: list of str
+        Lines of a .stats file containing the measure you want
+    suffix: str
+        Suffix added to each measure name, e.g. "_lh"
     info: dict
         Dictionary with all this subject's info
+    stats_name: str
+        Name of the stats file, used in the metadata
     """
-    with stats_file.open('r') as statsf:
-        lines = statsf.readlines()
-    suffix = ''
-    if '/rh.' in str(stats_file):
-        suffix = '_rh'
-    elif '/lh.' in str(stats_file):
-        suffix = '_lh'
-
-    measure_pat = re.compile(
-        '# Measure ([A-Za-z]+), ([A-Za-z]+),* [-A-Za-z ]+, ([0-9.]+), .*'
-    )
     for line in lines:
-        match = re.match(measure_pat, line)
-        if match:
-            pt1, pt2, value = match.groups()
-            pt1 = pt1 if pt1 == pt2 else f'{pt1}_{pt2}'
-            key = f'{pt1}{suffix}'
-            if key in info and not float(value) == info[key]['value']:
-                raise Exception(
-                    f'{key} is already in the metadata with a different value'
-                )
-            info[key] = {
-                'value': float(value),
-                'meta': (
-                    'This is a whole-brain metadata measure with two '
-                    f'possible labels, "{pt1}" and "{pt2}". It comes '
-                    f'from the stats/{stats_name} file.'
-                ),
-            }
+        if not line.startswith('# Measure'):
+            continue
+        match = MEASURE_PATTERN.match(line)
+        if match is None:
+            continue
+        pt1, pt2, value = match.groups()
+        value = float(value)
+        pt1 = pt1 if pt1 == pt2 else f'{pt1}_{pt2}'
+        key = f'{pt1}{suffix}'
+        current = info.get(key)
+        if current is not None and current['value'] != value:
+            raise Exception(f'{key} is already in the metadata with a different value')
+        info[key] = {
+            'value': value,
+            'meta': (
+                'This is a whole-brain metadata measure with two '
+                f'possible labels, "{pt1}" and "{pt2}". It comes '
+                f'from the stats/{stats_name} file.'
+            ),
+        }
 
 
 class _FSStatsInputSpec(TraitedSpec):
@@ -367,27 +457,43 @@ class FSStats(SimpleInterface):
         }
         fs_audit.update(get_euler_from_log(fs_dir / 'scripts' / 'recon-all.log'))
 
-        # Add global stats from two of the surface stats files
-        read_stats(
-            fs_dir / 'stats' / 'lh.aparc.pial.stats',
-            fs_audit,
-            get_measures=True,
-            measures_only=True,
-        )
-        read_stats(
-            fs_dir / 'stats' / 'rh.aparc.pial.stats',
-            fs_audit,
-            get_measures=True,
-            measures_only=True,
-        )
+        # The stats files are independent, so read each into its own dict
+        # concurrently and merge them afterwards
+        stats_dir = fs_dir / 'stats'
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                # Add global stats from two of the surface stats files
+                executor.submit(
+                    read_stats,
+                    stats_dir / 'lh.aparc.pial.stats',
+                    {},
+                    get_measures=True,
+                    measures_only=True,
+                ),
+                executor.submit(
+                    read_stats,
+                    stats_dir / 'rh.aparc.pial.stats',
+                    {},
+                    get_measures=True,
+                    measures_only=True,
+                ),
+                # And grab the volume stats from aseg
+                executor.submit(
+                    read_stats, stats_dir / 'aseg.stats', {}, get_measures=True
+                ),
+            ]
 
-        # And grab the volume stats from aseg
-        read_stats(fs_dir / 'stats' / 'aseg.stats', fs_audit, get_measures=True)
+        for future in futures:
+            stats_info = future.result()
+            for key, value in stats_info.items():
+                if key in fs_audit and fs_audit[key]['value'] != value['value']:
+                    raise Exception(
+                        f'{key} is already in the collected data with a different value'
+                    )
+            fs_audit.update(stats_info)
 
         # Remove SegId, it's the same for everyone
-        for key in list(fs_audit.keys()):
-            if 'SegId' in key:
-                del fs_audit[key]
+        fs_audit = {key: value for key, value in fs_audit.items() if 'SegId' not in key}
 
         # Write the outputs
         output_dir = Path(self.inputs.output_dir) / subject_id
@@ -399,21 +505,21 @@ class FSStats(SimpleInterface):
         whole_brain_json = output_dir / f'{output_prefix}_desc-FreeSurfer_qc.json'
 
         # Convert all the keys to snake case
-        fs_audit_renamed = {}
-        for key in fs_audit:
-            fs_audit_renamed[key.lower().replace('-', '_').replace('.', '_')] = (
-                fs_audit[key]
-            )
+        fs_audit_renamed = {
+            key.lower().translate(SNAKE_CASE_TABLE): value
+            for key, value in fs_audit.items()
+        }
         fs_audit_renamed['participant_id'] = fs_audit_renamed['subject_id']
         del fs_audit_renamed['subject_id']
 
         # Extract just the values from the audit data
         data_value = {key: value['value'] for key, value in fs_audit_renamed.items()}
         data_df = pd.DataFrame([data_value])
+        # Reorder columns to have participant_id first
+        data_df.insert(0, 'participant_id', data_df.pop('participant_id'))
 
-        cols = data_df.columns.tolist()
         id_cols = ['participant_id', 'session_id']
-        id_cols = [col for col in id_cols if col in cols]
+        id_cols = [col for col in id_cols if col in data_df.columns]
 
         # Split data_df into two dataframes, one for the atlas and one for the whole brain measures
         suffixes = [
@@ -432,27 +538,156 @@ class FSStats(SimpleInterface):
             if any(col.endswith(suffix) for suffix in suffixes)
         ]
         whole_brain_columns = [
-            col for col in data_df.columns if col not in atlas_columns
+            col
+            for col in data_df.columns
+            if col not in atlas_columns and col not in id_cols
         ]
         atlas_df = data_df[id_cols + atlas_columns]
-        whole_brain_df = data_df[id_cols + whole_brain_columns]
+        whole_brain_columns = id_cols + whole_brain_columns
 
         atlas_df = melt_with_suffix_list(atlas_df, id_cols, suffixes)
 
         # Create metadata with the same column names as the TSV
         wholebrain_metadata = {
-            key: fs_audit_renamed[key]['meta'] for key in whole_brain_df.columns
+            key: fs_audit_renamed[key]['meta'] for key in whole_brain_columns
+        }
+
+        # The whole brain measures are a single row, so skip pandas to write it
+        whole_brain_buffer = io.StringIO()
+        writer = csv.writer(whole_brain_buffer, delimiter='\t', lineterminator='\n')
+        writer.writerow(whole_brain_columns)
+        writer.writerow(tsv_cell(data_value[col]) for col in whole_brain_columns)
+
+        # Serialize everything up front, then write the files concurrently so
+        # the flushes overlap on slow shared filesystems
+        outputs = {
+            atlas_json: ASEG_STATS_METADATA_JSON,
+            whole_brain_json: json.dumps(wholebrain_metadata, indent=2, sort_keys=True),
+            atlas_tsv: atlas_df.to_csv(sep='\t', na_rep='n/a', index=False),
+            whole_brain_tsv: whole_brain_buffer.getvalue(),
         }
+        with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+            list(executor.map(Path.write_text, outputs.keys(), outputs.values()))
+        return runtime
 
-        with atlas_json.open('w') as jsonf:
-            json.dump(ASEG_STATS_METADATA, jsonf, indent=2, sort_keys=True)
 
-        with whole_brain_json.open('w') as jsonf:
-            json.dump(wholebrain_metadata, jsonf, indent=2, sort_keys=True)
+def _run_fs_stats(subject_id, subjects_dir, output_dir, session_id):
+    inputs = {
+        'subject_id': subject_id,
+        'subjects_dir': str(subjects_dir),
+        'output_dir': str(output_dir),
+    }
+    if session_id is not None:
+        inputs['session_id'] = session_id
+    FSStats(**inputs).run()
+    return subject_id
 
-        atlas_df.to_csv(atlas_tsv, sep='\t', na_rep='n/a', index=False)
-        whole_brain_df.to_csv(whole_brain_tsv, sep='\t', na_rep='n/a', index=False)
-        return runtime
+
+def run_fs_stats(subject_ids, subjects_dir, output_dir, session_id=None, n_jobs=None):
+    """Run FSStats for many subjects in parallel worker processes.
+
+    This is an alternative to running one workflow per subject when only the
+    whole-brain QC and aseg tables are needed. Parsing the stats files is
+    mostly pure Python, so subjects are spread across processes rather than
+    threads. See ``run_region_stats`` for the per-parcellation tables.
+
+    Parameters:
+    -----------
+    subject_ids : list of str
+        Subject IDs to process
+    subjects_dir : str or Path
+        Path to the FreeSurfer ${SUBJECTS_DIR}
+    output_dir : str or Path
+        Path to the output directory. Created if it does not exist.
+    session_id : str, optional
+        Session ID to use for every subject
+    n_jobs : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    --------
+    list of str
+        The subject IDs that were processed, in input order.
+    """
+    subject_ids = list(subject_ids)
+    # FSStats requires output_dir to exist already
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(
+            executor.map(
+                _run_fs_stats,
+                subject_ids,
+                repeat(subjects_dir),
+                repeat(output_dir),
+                repeat(session_id),
+            )
+        )
+
+
+def _run_region_stats(subject_id, atlas_name, subjects_dir, output_dir, session_id):
+    fs_dir = find_freesurfer_dir(subjects_dir, subject_id, session_id)
+    stats_dir = fs_dir / 'stats'
+    inputs = {
+        'subject_id': subject_id,
+        'atlas_name': atlas_name,
+        'subjects_dir': str(subjects_dir),
+        'output_dir': str(output_dir),
+    }
+    for hemi in hemispheres:
+        inputs[f'{hemi}_stats_file'] = str(stats_dir / f'{hemi}.{atlas_name}.stats')
+        inputs[f'{hemi}_gwr_stats_file'] = str(
+            stats_dir / f'{hemi}.{atlas_name}.g-w.pct.stats'
+        )
+    if session_id is not None:
+        inputs['session_id'] = session_id
+    SummarizeRegionStats(**inputs).run()
+    return subject_id, atlas_name
+
+
+def run_region_stats(
+    subject_ids, atlases, subjects_dir, output_dir, session_id=None, n_jobs=None
+):
+    """Run SummarizeRegionStats for many subjects and parcellations in parallel.
+
+    This only tabulates: the ``{hemi}.{atlas}.stats`` and
+    ``{hemi}.{atlas}.g-w.pct.stats`` files must already be in each subject's
+    ``stats`` directory, e.g. from an earlier run of the workflow. Each
+    (subject, atlas) pair is run in its own worker process.
+
+    Parameters:
+    -----------
+    subject_ids : list of str
+        Subject IDs to process
+    atlases : list of str
+        Parcellations to tabulate for every subject
+    subjects_dir : str or Path
+        Path to the FreeSurfer ${SUBJECTS_DIR}
+    output_dir : str or Path
+        Path to the output directory. Created if it does not exist.
+    session_id : str, optional
+        Session ID to use for every subject
+    n_jobs : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    --------
+    list of tuple of str
+        The (subject ID, atlas) pairs that were processed, subject by subject.
+    """
+    pairs = list(product(subject_ids, atlases))
+    # SummarizeRegionStats requires output_dir to exist already
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(
+            executor.map(
+                _run_region_stats,
+                [subject_id for subject_id, _ in pairs],
+                [atlas_name for _, atlas_name in pairs],
+                repeat(subjects_dir),
+                repeat(output_dir),
+                repeat(session_id),
+            )
+        )
 
 
 def melt_with_suffix_list(df, id_cols, suffixes):
@@ -473,44 +708,27 @@ def melt_with_suffix_list(df, id_cols, suffixes):
         DataFrame in long form with ID columns, 'name' column, and separate columns for each
         suffix.
     """
-    # Get all non-ID columns
-    all_cols = df.columns.tolist()
-    non_id_cols = [col for col in all_cols if col not in id_cols]
+    clean_suffixes = [suffix.lstrip('_') for suffix in suffixes]
 
     # Find all unique names by removing suffixes from column names
-    names = []
-    for col in non_id_cols:
-        for suffix in suffixes:
-            if col.endswith(suffix):
-                name = col[: -len(suffix)]  # Remove the suffix to get the name
-                names.append(name)
-                continue
+    names = list(
+        dict.fromkeys(
+            col[: -len(suffix)]
+            for col in df.columns
+            if col not in id_cols
+            for suffix in suffixes
+            if col.endswith(suffix)
+        )
+    )
+    n_names = len(names)
+
+    # Build the long form column by column: each input row becomes one block of
+    # n_names output rows. Missing name/suffix combinations become NaN.
+    long_data = {col: np.repeat(df[col].to_numpy(), n_names) for col in id_cols}
+    long_data['name'] = np.tile(names, len(df))
+    for suffix, clean_suffix in zip(suffixes, clean_suffixes, strict=True):
+        long_data[clean_suffix] = (
+            df.reindex(columns=[name + suffix for name in names]).to_numpy().ravel()
+        )
 
-    # Create the result DataFrame starting with ID columns
-    result_rows = []
-
-    for _, row in df.iterrows():
-        for name in names:
-            new_row = {}
-            # Add ID columns
-            for id_col in id_cols:
-                new_row[id_col] = row[id_col]
-
-            # Add the name
-            new_row['name'] = name
-
-            # Add values for each suffix
-            for suffix in suffixes:
-                col_name = name + suffix
-                if col_name in df.columns:
-                    # Remove leading underscore from suffix for cleaner column name
-                    clean_suffix = suffix.lstrip('_')
-                    new_row[clean_suffix] = row[col_name]
-                else:
-                    # If column doesn't exist, add NaN or None
-                    clean_suffix = suffix.lstrip('_')
-                    new_row[clean_suffix] = None
-
-            result_rows.append(new_row)
-
-    return pd.DataFrame(result_rows)
+    return pd.DataFrame(long_data)
@@ -1,6 +1,7 @@
 """Utility functions for FreeSurfer post-processing."""
 
 import warnings
+from functools import lru_cache
 from pathlib import Path
 
 
@@ -9,6 +10,9 @@ def find_freesurfer_dir(
 ) -> Path:
     """Find a valid FreeSurfer subject directory in a directory.
 
+    Results are cached, so repeated lookups for the same subject and session
+    don't touch the filesystem again.
+
     Parameters
     ----------
     subjects_dir : str or Path
@@ -23,25 +27,34 @@ def find_freesurfer_dir(
     Path
         Path to valid FreeSurfer subject directory
     """
-    subjects_dir = Path(subjects_dir)
+    return _find_freesurfer_dir(str(subjects_dir), subject_id, session_id)
 
-    if not subjects_dir.exists():
-        raise FileNotFoundError(f'Subjects directory {subjects_dir} does not exist')
 
-    warn_no_session = False
+@lru_cache(maxsize=1024)
+def _find_freesurfer_dir(
+    subjects_dir: str, subject_id: str, session_id: str | None
+) -> Path:
+    subjects_dir = Path(subjects_dir)
+
+    # Look for the subject directories first: if one exists, so does
+    # subjects_dir, and the extra stat() is only needed for the error message
     if session_id is not None:
-        if (subjects_dir / f'{subject_id}_{session_id}').exists():
-            return subjects_dir / f'{subject_id}_{session_id}'
-        warn_no_session = True
+        session_dir = subjects_dir / f'{subject_id}_{session_id}'
+        if session_dir.exists():
+            return session_dir
 
-    if (subjects_dir / subject_id).exists():
-        if warn_no_session:
+    subject_dir = subjects_dir / subject_id
+    if subject_dir.exists():
+        if session_id is not None:
             warnings.warn(
                 f'{subjects_dir}/{subject_id}_{session_id} not found in {subjects_dir}'
                 f' using {subjects_dir}/{subject_id} instead',
-                stacklevel=2,
+                stacklevel=3,
             )
-        return subjects_dir / subject_id
+        return subject_dir
+
+    if not subjects_dir.exists():
+        raise FileNotFoundError(f'Subjects directory {subjects_dir} does not exist')
     raise FileNotFoundError(
         f'No directory found for subject: {subject_id}, session: {session_id}'
     )
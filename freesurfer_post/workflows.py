@@ -1,11 +1,17 @@
+import os
+from collections.abc import Iterable
 from pathlib import Path
 
 import nipype.interfaces.utility as niu
 import nipype.pipeline.engine as pe
-from nipype.interfaces import freesurfer as fs
 from nipype.interfaces.base import traits
 
-from .interfaces import FSStats, SummarizeRegionStats, SurfStatsMetadata
+from .interfaces import (
+    FSStats,
+    SummarizeRegionStats,
+    SurfStatsMetadata,
+    WarmPageCache,
+)
 
 # Directory in the container with the collection of annots
 ANNOTS_DIR = Path('/opt/freesurfer_tabulate/annots/')
@@ -38,6 +44,33 @@ AVAILABLE_PARCELLATIONS = [
 # Atlases that come from freesurfer and are already in fsnative
 NATIVE_PARCELLATIONS = ['aparc.DKTatlas', 'aparc.a2009s', 'aparc', 'BA_exvivo']
 
+# Subject files that mris_anatomical_stats reads for every parcellation
+PARCSTATS_SHARED_INPUTS = [
+    'mri/wm.mgz',
+    'mri/transforms/talairach.xfm',
+    'mri/brainmask.mgz',
+    'mri/aseg.presurf.mgz',
+    'mri/ribbon.mgz',
+    'surf/lh.white',
+    'surf/rh.white',
+    'surf/lh.pial',
+    'surf/rh.pial',
+    'surf/lh.thickness',
+    'surf/rh.thickness',
+    'label/lh.cortex.label',
+    'label/rh.cortex.label',
+]
+
+# Set for fast membership tests; the list above keeps the processing order
+_AVAILABLE_PARCELLATIONS_SET = frozenset(AVAILABLE_PARCELLATIONS)
+
+# fsaverage annots for each (hemisphere, parcellation) to be warped to native
+_FSAVERAGE_ANNOTS = {
+    (hemi, parc_name): str(ANNOTS_DIR / f'{hemi}.{parc_name}.annot')
+    for hemi in ('lh', 'rh')
+    for parc_name in AVAILABLE_PARCELLATIONS
+}
+
 
 def build_workflow(
     subject_id: str,
@@ -45,17 +78,56 @@ def build_workflow(
     subject_freesurfer_dir: str | Path,
     output_dir: str | Path,
     working_dir: str | Path,
+    *,
+    omp_nthreads: int = 1,
+    atlases: Iterable[str] | None = None,
+    reuse_existing: bool = False,
 ):
-    subject_freesurfer_dir = Path(subject_freesurfer_dir)
+    """
+    Build the workflow for a single subject/session.
+
+    The parcellations share no data, so the graph parallelizes well
+    with ``workflow.run(plugin='MultiProc', plugin_args={'n_procs': N})``.
+
+    Parameters
+    ----------
+    subject_id : str
+        Subject ID.
+    session_id : str | None
+        Session ID.
+    subject_freesurfer_dir : str | Path
+        Path to the subject's FreeSurfer directory. May include session.
+    output_dir : str | Path
+        Path to the output directory.
+    working_dir : str | Path
+        Path to the nipype working directory.
+    omp_nthreads : int
+        Number of OpenMP threads for each FreeSurfer command.
+    atlases : Iterable[str] | None
+        Parcellations to process. Defaults to all available parcellations.
+    reuse_existing : bool
+        Reuse stats tables and warped annots from a previous run if they are
+        newer than the subject's surfaces. See ``add_parcellation_nodes``.
+
+    Returns
+    -------
+    workflow : pe.Workflow
+        Workflow for the subject.
+    """
+    if omp_nthreads < 1:
+        raise ValueError(f'omp_nthreads must be at least 1, got {omp_nthreads}')
+
+    if not isinstance(subject_freesurfer_dir, Path):
+        subject_freesurfer_dir = Path(subject_freesurfer_dir)
     subjects_dir = str(subject_freesurfer_dir.parent)
-    output_dir = Path(output_dir)
-    working_dir = Path(working_dir)
+    if not isinstance(output_dir, Path):
+        output_dir = Path(output_dir)
+    if not isinstance(working_dir, Path):
+        working_dir = Path(working_dir)
 
     workflow = pe.Workflow(name=f'freesurfer_post_{subject_id}')
     workflow.base_dir = working_dir
-    workflow.config['execution'] = {'crashdump_dir': output_dir / 'crash'}
-    workflow.config['execution']['crashdump_dir'] = output_dir / 'crash'
-    workflow.config['execution']['crashdump_dir'] = output_dir / 'crash'
+    workflow.config['execution'] = {'crashdump_dir': str(output_dir / 'crash')}
 
     inputnode = pe.Node(
         niu.IdentityInterface(
@@ -66,21 +138,46 @@ def build_workflow(
     inputnode.inputs.subject_id = subject_id
     inputnode.inputs.session_id = session_id if session_id else traits.Undefined
     inputnode.inputs.fs_subjects_dir = subjects_dir
-    inputnode.inputs.output_dir = output_dir
+    inputnode.inputs.output_dir = str(output_dir)
+
+    parcellations = AVAILABLE_PARCELLATIONS + NATIVE_PARCELLATIONS
+    if atlases is not None:
+        # A single name would otherwise be taken apart character by character
+        if isinstance(atlases, str):
+            raise TypeError('atlases must be an iterable of atlas names, not a str')
+        atlases = set(atlases)
+        unknown_atlases = atlases.difference(parcellations)
+        if unknown_atlases:
+            raise ValueError(f'Unknown atlases: {", ".join(sorted(unknown_atlases))}')
+        # Keep the usual processing order
+        parcellations = [
+            parc_name for parc_name in parcellations if parc_name in atlases
+        ]
 
-    for parc_name in AVAILABLE_PARCELLATIONS + NATIVE_PARCELLATIONS:
-        parc_wf = init_parcellation_wf(
+    # Read the inputs shared by all the parcstats nodes once, so they don't
+    # each pull the same files from a cold filesystem. The node only joins
+    # the graph if some parcellation connects a parcstats node to it.
+    warm_page_cache = pe.Node(WarmPageCache(), name='warm_page_cache')
+
+    for parc_name in parcellations:
+        add_parcellation_nodes(
+            workflow,
+            inputnode,
             subject_id=subject_id,
             subject_freesurfer_dir=subject_freesurfer_dir,
             parc_name=parc_name,
+            omp_nthreads=omp_nthreads,
+            page_cache_node=warm_page_cache,
+            reuse_existing=reuse_existing,
         )
+
+    if workflow.get_node('warm_page_cache') is not None:
+        warm_page_cache.inputs.in_files = [
+            f'{subject_freesurfer_dir}/{shared_input}'
+            for shared_input in PARCSTATS_SHARED_INPUTS
+        ]
         workflow.connect([
-            (inputnode, parc_wf, [
-                ('subject_id', 'inputnode.subject_id'),
-                ('session_id', 'inputnode.session_id'),
-                ('fs_subjects_dir', 'inputnode.fs_subjects_dir'),
-                ('output_dir', 'inputnode.output_dir'),
-            ]),
+            (inputnode, warm_page_cache, [('fs_subjects_dir', 'subjects_dir')]),
         ])  # fmt:skip
 
     # Get the segmentation stats and euler number
@@ -94,23 +191,75 @@ def build_workflow(
         ]),
     ])  # fmt:skip
 
+    # The surface stats metadata is the same for every parcellation. It is
+    # written outside the node's working directory, so nipype's cache can't
+    # tell if it was deleted: always rewrite it, it's a single small file.
+    # (pe.Node has no always_run argument; overwrite forces the rerun.)
+    surf_stats_metadata = pe.Node(
+        SurfStatsMetadata(),
+        name='surf_stats_metadata',
+        overwrite=True,
+    )
+    workflow.connect([
+        (inputnode, surf_stats_metadata, [
+            ('output_dir', 'output_dir'),
+            ('subject_id', 'subject_id'),
+        ]),
+    ])  # fmt:skip
+
     return workflow
 
 
-def init_parcellation_wf(
-    subject_id: str, subject_freesurfer_dir: str | Path, parc_name: str
+def _is_newer(out_files, ref_files):
+    """Check that all ``out_files`` exist and are newer than all ``ref_files``."""
+    try:
+        oldest_output = min(os.stat(out_file).st_mtime_ns for out_file in out_files)
+        newest_reference = max(os.stat(ref_file).st_mtime_ns for ref_file in ref_files)
+    except FileNotFoundError:
+        return False
+    return oldest_output > newest_reference
+
+
+def add_parcellation_nodes(
+    workflow,
+    inputnode,
+    subject_id: str,
+    subject_freesurfer_dir: str | Path,
+    parc_name: str,
+    *,
+    omp_nthreads: int = 1,
+    page_cache_node=None,
+    reuse_existing: bool = False,
 ):
     """
-    Initialize a workflow to process a single parcellation.
+    Add the nodes to process a single parcellation to a workflow.
+
+    The nodes are added directly to ``workflow`` rather than to a nested
+    workflow, which keeps graph construction cheap with many parcellations.
 
     Parameters
     ----------
+    workflow : pe.Workflow
+        Workflow to add the nodes to.
+    inputnode : pe.Node
+        Node in ``workflow`` providing the inputs listed below.
     subject_id : str
         Subject ID. Needed to construct the bizarre input for SegStats.
     subject_freesurfer_dir : str | Path
         Path to the subject's FreeSurfer directory. May include session.
     parc_name : str
         Name of the parcellation to process.
+    omp_nthreads : int
+        Number of OpenMP threads for mri_surf2surf and mris_anatomical_stats.
+    page_cache_node : pe.Node | None
+        Node with a ``subjects_dir`` output that the parcstats nodes should
+        wait for, e.g. one that warms the page cache. If None, they take
+        ``fs_subjects_dir`` straight from ``inputnode``.
+    reuse_existing : bool
+        If True, a hemisphere whose stats table and g-w.pct summary are both
+        newer than its white surface and sphere.reg is passed through instead
+        of recomputed, and likewise an already warped annot. Outputs older
+        than the surfaces (e.g. after recon-all was re-run) are recomputed.
 
     Inputs
     ------
@@ -126,27 +275,21 @@ def init_parcellation_wf(
     Returns
     -------
     workflow : pe.Workflow
-        Workflow to process the parcellation.
+        The workflow that was passed in.
     """
-    inputnode = pe.Node(
-        niu.IdentityInterface(
-            fields=['subject_id', 'session_id', 'fs_subjects_dir', 'output_dir'],
-        ),
-        name='inputnode',
-    )
+    # Unlike the engine, the FreeSurfer interfaces aren't loaded by
+    # importing nipype, so only import them once they are needed
+    from nipype.interfaces import freesurfer as fs
+
     clean_parc_name = parc_name.replace('.', '').replace('_', '')
-    workflow = pe.Workflow(name=f'parcellation_{clean_parc_name}')
+    # Plain strings are cheaper to format and hash than Paths
+    subject_freesurfer_dir = str(subject_freesurfer_dir)
 
     collect_stats = pe.Node(
         SummarizeRegionStats(
             atlas_name=parc_name,
         ),
-        name='collect_stats',
-    )
-    surf_stats_metadata = pe.Node(
-        SurfStatsMetadata(),
-        name='surf_stats_metadata',
-        always_run=True,
+        name=f'{clean_parc_name}_collect_stats',
     )
     workflow.connect([
         (inputnode, collect_stats, [
@@ -155,32 +298,73 @@ def init_parcellation_wf(
             ('fs_subjects_dir', 'subjects_dir'),
             ('output_dir', 'output_dir'),
         ]),
-        (inputnode, surf_stats_metadata, [
-            ('output_dir', 'output_dir'),
-            ('subject_id', 'subject_id'),
-        ]),
     ])  # fmt:skip
     transform_nodes = {}
     parc_stats_nodes = {}
     gwr_seg_stats_nodes = {}
+    # These inputs are the same for both hemispheres
+    mri_dir = subject_freesurfer_dir + '/mri/'
+    surf_dir = subject_freesurfer_dir + '/surf/'
+    label_dir = subject_freesurfer_dir + '/label/'
+    stats_dir = subject_freesurfer_dir + '/stats/'
+    wm = mri_dir + 'wm.mgz'
+    lh_white = surf_dir + 'lh.white'
+    rh_white = surf_dir + 'rh.white'
+    lh_pial = surf_dir + 'lh.pial'
+    rh_pial = surf_dir + 'rh.pial'
+    transform = mri_dir + 'transforms/talairach.xfm'
+    brainmask = mri_dir + 'brainmask.mgz'
+    aseg = mri_dir + 'aseg.presurf.mgz'
+    ribbon = mri_dir + 'ribbon.mgz'
+    omp_environ = {'OMP_NUM_THREADS': str(omp_nthreads)}
+    # The parcstats nodes wait for page_cache_node by taking subjects_dir from it
+    if page_cache_node is None:
+        subjects_dir_node, subjects_dir_field = inputnode, 'fs_subjects_dir'
+    else:
+        subjects_dir_node, subjects_dir_field = page_cache_node, 'subjects_dir'
+    # Only the fsaverage parcellations need to be warped to the subject
+    warp_annot = parc_name in _AVAILABLE_PARCELLATIONS_SET
     for hemi in ['lh', 'rh']:
-        fsaverage_annot = ANNOTS_DIR / f'{hemi}.{parc_name}.annot'
         # native annot is created by SurfaceTransform if it's not a NATIVE_PARCELLATION
         # otherwise it's already present in the subject's directory
-        native_annot = subject_freesurfer_dir / 'label' / f'{hemi}.{parc_name}.annot'
-        stats_file = subject_freesurfer_dir / 'stats' / f'{hemi}.{parc_name}.stats'
-        gwr_stats_file = (
-            subject_freesurfer_dir / 'stats' / f'{hemi}.{parc_name}.g-w.pct.stats'
-        )
-        if parc_name in AVAILABLE_PARCELLATIONS:
+        native_annot = f'{label_dir}{hemi}.{parc_name}.annot'
+        stats_file = f'{stats_dir}{hemi}.{parc_name}.stats'
+        gwr_stats_file = f'{stats_dir}{hemi}.{parc_name}.g-w.pct.stats'
+
+        # Outputs of a previous run are only valid for the same surfaces
+        surfaces = [f'{surf_dir}{hemi}.white', f'{surf_dir}{hemi}.sphere.reg']
+
+        # Reuse the stats from a previous run instead of recomputing them
+        if reuse_existing and _is_newer([stats_file, gwr_stats_file], surfaces):
+            parc_stats_nodes[hemi] = pe.Node(
+                niu.IdentityInterface(fields=['out_table']),
+                name=f'{hemi}_{clean_parc_name}_parcstats',
+            )
+            parc_stats_nodes[hemi].inputs.out_table = stats_file
+            gwr_seg_stats_nodes[hemi] = pe.Node(
+                niu.IdentityInterface(fields=['summary_file']),
+                name=f'{hemi}_{clean_parc_name}_gwr_segstats',
+            )
+            gwr_seg_stats_nodes[hemi].inputs.summary_file = gwr_stats_file
+            workflow.connect([
+                (parc_stats_nodes[hemi], collect_stats, [('out_table', f'{hemi}_stats_file')]),
+                (gwr_seg_stats_nodes[hemi], collect_stats, [('summary_file', f'{hemi}_gwr_stats_file')]),
+            ])  # fmt: skip
+            continue
+
+        # The annot only needs warping if a previous run hasn't already done it
+        if warp_annot and not (reuse_existing and _is_newer([native_annot], surfaces)):
             transform_nodes[hemi] = pe.Node(
                 fs.SurfaceTransform(
                     source_subject='fsaverage',
                     hemi=hemi,
-                    source_annot_file=fsaverage_annot,
+                    source_annot_file=_FSAVERAGE_ANNOTS[(hemi, parc_name)],
                     out_file=native_annot,
+                    environ=omp_environ,
                 ),
                 name=f'{hemi}_{clean_parc_name}_transform',
+                n_procs=omp_nthreads,
+                mem_gb=0.5,
             )
         else:
             transform_nodes[hemi] = pe.Node(
@@ -199,32 +383,35 @@ def init_parcellation_wf(
                 args='-noglobal',
                 # Mandatory for some reason
                 hemisphere=hemi,
-                wm=f'{subject_freesurfer_dir}/mri/wm.mgz',
-                lh_white=f'{subject_freesurfer_dir}/surf/lh.white',
-                rh_white=f'{subject_freesurfer_dir}/surf/rh.white',
-                lh_pial=f'{subject_freesurfer_dir}/surf/lh.pial',
-                rh_pial=f'{subject_freesurfer_dir}/surf/rh.pial',
-                transform=f'{subject_freesurfer_dir}/mri/transforms/talairach.xfm',
-                thickness=f'{subject_freesurfer_dir}/surf/{hemi}.thickness',
-                brainmask=f'{subject_freesurfer_dir}/mri/brainmask.mgz',
-                aseg=f'{subject_freesurfer_dir}/mri/aseg.presurf.mgz',
-                ribbon=f'{subject_freesurfer_dir}/mri/ribbon.mgz',
-                cortex_label=f'{subject_freesurfer_dir}/label/{hemi}.cortex.label',
+                wm=wm,
+                lh_white=lh_white,
+                rh_white=rh_white,
+                lh_pial=lh_pial,
+                rh_pial=rh_pial,
+                transform=transform,
+                thickness=f'{surf_dir}{hemi}.thickness',
+                brainmask=brainmask,
+                aseg=aseg,
+                ribbon=ribbon,
+                cortex_label=f'{label_dir}{hemi}.cortex.label',
+                environ=omp_environ,
             ),
             name=f'{hemi}_{clean_parc_name}_parcstats',
+            n_procs=omp_nthreads,
+            mem_gb=0.5,
         )
 
         # mri_segstats
         gwr_seg_stats_nodes[hemi] = pe.Node(
             fs.SegStats(
-                in_file=str(
-                    subject_freesurfer_dir / 'surf' / f'{hemi}.w-g.pct.mgh',
-                ),
+                in_file=f'{surf_dir}{hemi}.w-g.pct.mgh',
                 annot=(subject_id, hemi, parc_name),
                 calc_snr=True,
                 summary_file=gwr_stats_file,
             ),
             name=f'{hemi}_{clean_parc_name}_gwr_segstats',
+            n_procs=1,
+            mem_gb=0.5,
         )
 
         workflow.connect([
@@ -232,12 +419,10 @@ def init_parcellation_wf(
                 ('subject_id', 'target_subject'),
                 ('fs_subjects_dir', 'subjects_dir'),
             ]),
-            (inputnode, parc_stats_nodes[hemi], [
-                ('subject_id', 'subject_id'),
-                ('fs_subjects_dir', 'subjects_dir'),
-            ]),
+            (inputnode, parc_stats_nodes[hemi], [('subject_id', 'subject_id')]),
             (inputnode, gwr_seg_stats_nodes[hemi], [('fs_subjects_dir', 'subjects_dir')]),
 
+            (subjects_dir_node, parc_stats_nodes[hemi], [(subjects_dir_field, 'subjects_dir')]),
             (transform_nodes[hemi], parc_stats_nodes[hemi], [('out_file', 'in_annotation')]),
             (parc_stats_nodes[hemi], collect_stats, [('out_table', f'{hemi}_stats_file')]),
             (gwr_seg_stats_nodes[hemi], collect_stats, [('summary_file', f'{hemi}_gwr_stats_file')]),
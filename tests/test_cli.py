@@ -0,0 +1,36 @@
+"""Tests for freesurfer_post.cli module."""
+
+from click.testing import CliRunner
+
+from freesurfer_post.cli import main
+
+
+class TestCLIOptions:
+    """Test cases for validating command line options."""
+
+    def test_unknown_atlas(self, tmp_path):
+        """Test that an unknown atlas is a usage error, not a traceback."""
+        result = CliRunner().invoke(
+            main,
+            [
+                str(tmp_path),
+                str(tmp_path / 'out'),
+                '--atlases',
+                'aparc',
+                '--atlases',
+                'nope',
+            ],
+        )
+
+        assert result.exit_code == 2
+        assert 'unknown atlases: nope' in result.output
+        assert 'Processing' not in result.output
+
+    def test_omp_nthreads_invalid(self, tmp_path):
+        """Test that fewer than one OpenMP thread is a usage error."""
+        result = CliRunner().invoke(
+            main, [str(tmp_path), str(tmp_path / 'out'), '--omp-nthreads', '0']
+        )
+
+        assert result.exit_code == 2
+        assert '--omp-nthreads' in result.output
@@ -0,0 +1,68 @@
+"""Tests for freesurfer_post.interfaces.interfaces module."""
+
+import builtins
+import json
+
+from freesurfer_post.interfaces import interfaces
+from freesurfer_post.interfaces.interfaces import SurfStatsMetadata, WarmPageCache
+
+
+class TestWarmPageCache:
+    """Test cases for reading files into the page cache."""
+
+    def test_warm_page_cache(self, tmp_path, monkeypatch):
+        """Test that every file is read in full and subjects_dir passes through."""
+        monkeypatch.chdir(tmp_path)
+        subjects_dir = tmp_path / 'subjects'
+        subjects_dir.mkdir()
+        in_files = {
+            subjects_dir / 'small.mgz': b'x' * 10,
+            # Larger than the read buffer
+            subjects_dir / 'large.mgz': b'y' * (3 << 20),
+        }
+        for in_file, content in in_files.items():
+            in_file.write_bytes(content)
+
+        bytes_read = {}
+
+        def recording_open(file, *args, **kwargs):
+            fobj = builtins.open(file, *args, **kwargs)  # noqa: SIM115
+            readinto = fobj.readinto
+
+            def recording_readinto(buffer):
+                n_bytes = readinto(buffer)
+                bytes_read[file] = bytes_read.get(file, 0) + n_bytes
+                return n_bytes
+
+            fobj.readinto = recording_readinto
+            return fobj
+
+        monkeypatch.setattr(interfaces, 'open', recording_open, raising=False)
+
+        result = WarmPageCache(
+            in_files=[str(in_file) for in_file in in_files],
+            subjects_dir=str(subjects_dir),
+        ).run()
+
+        assert result.outputs.subjects_dir == str(subjects_dir)
+        assert bytes_read == {
+            str(in_file): len(content) for in_file, content in in_files.items()
+        }
+
+
+class TestSurfStatsMetadata:
+    """Test cases for writing the surface stats sidecar."""
+
+    def test_surf_stats_metadata_new_output_dir(self, tmp_path, monkeypatch):
+        """Test that the subject's output directory is created if needed."""
+        monkeypatch.chdir(tmp_path)
+        output_dir = tmp_path / 'out'
+        output_dir.mkdir()
+
+        result = SurfStatsMetadata(
+            output_dir=str(output_dir), subject_id='sub-01'
+        ).run()
+
+        out_file = output_dir / 'sub-01' / 'sub-01_surfacestats.json'
+        assert result.outputs.out_file == str(out_file)
+        assert json.loads(out_file.read_text())
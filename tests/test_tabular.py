@@ -0,0 +1,313 @@
+"""Tests for freesurfer_post.interfaces.tabular module."""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from freesurfer_post.interfaces.tabular import (
+    get_euler_from_log,
+    melt_with_suffix_list,
+    read_stats,
+    run_fs_stats,
+    run_region_stats,
+    statsfile_to_df,
+    tsv_cell,
+)
+
+ASEG_STATS = """# Title Segmentation Statistics
+# Measure BrainSeg, BrainSegVol, Brain Segmentation Volume, 1188553.000000, mm^3
+# Measure EstimatedTotalIntraCranialVol, eTIV, Estimated Total Intracranial Volume, 1500000.5, mm^3
+# ColHeaders  Index SegId NVoxels Volume_mm3 StructName normMean
+  1   4     6543     6543.0  Left-Lateral-Ventricle     37.1
+  2  14      900      900.0  3rd-Ventricle              45.0
+"""
+
+APARC_PIAL_STATS = """# Table of FreeSurfer cortical parcellation anatomical statistics
+# Measure Cortex, NumVert, Number of Vertices, 150000, unitless
+# Measure BrainSeg, BrainSegVol, Brain Segmentation Volume, 1188553.000000, mm^3
+# ColHeaders StructName NumVert SurfArea GrayVol ThickAvg
+bankssts  1000  700 2000 2.5
+"""
+
+RECON_ALL_LOG = """mri_fix_topology
+orig.nofix lheno =  -32, rheno =  -28
+orig.nofix lhholes =   17, rhholes =   15
+"""
+
+SURF_STATS = """# Table of FreeSurfer cortical parcellation anatomical statistics
+# ColHeaders StructName NumVert SurfArea GrayVol ThickAvg
+7Networks_LH_Vis_1  1000  700 2000 2.5
+7Networks_LH_Vis_2  2000  1401 3000 2.1
+"""
+
+GWR_STATS = """# Title Segmentation Statistics
+# ColHeaders  Index SegId NVertices Area_mm2 StructName Mean
+  1  1  1000  700.0 7Networks_LH_Vis_1  20.1
+  2  2  2000  1400.9 7Networks_LH_Vis_2  21.1
+"""
+
+
+@pytest.fixture
+def aseg_stats(tmp_path):
+    stats_file = tmp_path / 'aseg.stats'
+    stats_file.write_text(ASEG_STATS)
+    return stats_file
+
+
+class TestReadStats:
+    """Test cases for reading FreeSurfer stats tables."""
+
+    def test_read_stats_table(self, aseg_stats):
+        """Test that every table cell is flattened into info."""
+        info = {}
+        read_stats(aseg_stats, info)
+
+        assert info['Left_Lateral_Ventricle_NVoxels']['value'] == 6543
+        assert info['Third_Ventricle_Volume_mm3']['value'] == 900.0
+        assert info['Third_Ventricle_normMean']['value'] == 45.0
+        assert 'Left_Lateral_Ventricle_Index' not in info
+        assert 'normMean' in info['Third_Ventricle_normMean']['meta']
+
+    def test_read_stats_measures(self, aseg_stats):
+        """Test that the # Measure lines are parsed."""
+        info = {}
+        read_stats(aseg_stats, info, get_measures=True, measures_only=True)
+
+        assert info == {
+            'BrainSeg_BrainSegVol': {
+                'value': 1188553.0,
+                'meta': info['BrainSeg_BrainSegVol']['meta'],
+            },
+            'EstimatedTotalIntraCranialVol_eTIV': {
+                'value': 1500000.5,
+                'meta': info['EstimatedTotalIntraCranialVol_eTIV']['meta'],
+            },
+        }
+
+    def test_read_stats_duplicate(self, aseg_stats):
+        """Test that values already in info are not overwritten."""
+        info = {'Third_Ventricle_NVoxels': {'value': 1, 'meta': ''}}
+
+        with pytest.raises(Exception, match='already present'):
+            read_stats(aseg_stats, info)
+
+
+class TestStatsfileToDf:
+    """Test cases for loading a parcellation stats table."""
+
+    def test_statsfile_to_df(self, tmp_path):
+        """Test column suffixes and numeric conversion."""
+        stats_file = tmp_path / 'lh.atlas.g-w.pct.stats'
+        stats_file.write_text(GWR_STATS)
+
+        df = statsfile_to_df(stats_file, 'lh', 'atlas', column_suffix='_wgpct')
+
+        assert df.columns.tolist() == [
+            'atlas',
+            'hemisphere',
+            'Index',
+            'SegId',
+            'NVertices_wgpct',
+            'Area_mm2_wgpct',
+            'StructName',
+            'Mean_wgpct',
+        ]
+        assert df['StructName'].tolist() == ['7Networks_LH_Vis_1', '7Networks_LH_Vis_2']
+        assert df['NVertices_wgpct'].tolist() == [1000, 2000]
+        assert df['Mean_wgpct'].dtype.kind == 'f'
+
+
+class TestEulerFromLog:
+    """Test cases for reading QC values from recon-all.log."""
+
+    def test_get_euler_from_log(self, tmp_path):
+        """Test that the euler numbers and holes are found."""
+        reconlog = tmp_path / 'recon-all.log'
+        reconlog.write_text(
+            'mri_fix_topology\n'
+            'orig.nofix lheno =  -32, rheno =  -28\n'
+            'orig.nofix lhholes =   17, rhholes =   15\n'
+            'done\n'
+        )
+
+        qc = get_euler_from_log(reconlog)
+
+        assert qc['lh_euler']['value'] == -32
+        assert qc['rh_euler']['value'] == -28
+        assert qc['lh_holes']['value'] == 17
+        assert qc['rh_holes']['value'] == 15
+
+    def test_get_euler_from_log_duplicate(self, tmp_path):
+        """Test that a log with the QC lines from two runs is rejected."""
+        reconlog = tmp_path / 'recon-all.log'
+        reconlog.write_text(
+            'orig.nofix lheno =  -40, rheno =  -36\n'
+            'orig.nofix lhholes =   21, rhholes =   19\n'
+            'orig.nofix lheno =  -32, rheno =  -28\n'
+            'orig.nofix lhholes =   17, rhholes =   15\n'
+        )
+
+        with pytest.raises(Exception, match='lheno found more than once'):
+            get_euler_from_log(reconlog)
+
+    def test_get_euler_from_log_unrelated_lines(self, tmp_path):
+        """Test that other lines mentioning the QC names are not duplicates."""
+        reconlog = tmp_path / 'recon-all.log'
+        reconlog.write_text(
+            '#@# Fix Topology lh\n'
+            'orig.nofix lheno =  -32, rheno =  -28\n'
+            'orig.nofix lhholes =   17, rhholes =   15\n'
+            'defect-labels lheno lhholes\n'
+            'orig.nofix lhsomething else\n'
+        )
+
+        qc = get_euler_from_log(reconlog)
+
+        assert qc['lh_euler']['value'] == -32
+        assert qc['rh_holes']['value'] == 15
+
+
+class TestTsvCell:
+    """Test cases for preparing whole-brain values for the TSV."""
+
+    def test_tsv_cell_numpy_scalars(self):
+        """Test that numpy scalars are written as plain numbers."""
+        assert [
+            str(tsv_cell(value))
+            for value in (np.float64(1188553.0), np.int64(-32), np.float32(0.5))
+        ] == ['1188553.0', '-32', '0.5']
+
+    def test_tsv_cell_missing(self):
+        """Test that missing values are written as n/a."""
+        assert tsv_cell(None) == 'n/a'
+        assert tsv_cell(np.nan) == 'n/a'
+        assert tsv_cell('sub-01') == 'sub-01'
+
+
+class TestMeltWithSuffixList:
+    """Test cases for reshaping the aseg stats to long form."""
+
+    def test_melt_with_suffix_list(self):
+        """Test that there is one row per structure."""
+        df = pd.DataFrame(
+            [
+                {
+                    'participant_id': 'sub-01',
+                    'session_id': 'ses-01',
+                    'third_ventricle_nvoxels': 900,
+                    'third_ventricle_volume_mm3': 900.5,
+                    'left_lateral_ventricle_nvoxels': 6543,
+                    'left_lateral_ventricle_volume_mm3': 6543.0,
+                }
+            ]
+        )
+
+        long_df = melt_with_suffix_list(
+            df, ['participant_id', 'session_id'], ['_nvoxels', '_volume_mm3']
+        )
+
+        assert long_df.columns.tolist() == [
+            'participant_id',
+            'session_id',
+            'name',
+            'nvoxels',
+            'volume_mm3',
+        ]
+        assert long_df['name'].tolist() == [
+            'third_ventricle',
+            'left_lateral_ventricle',
+        ]
+        assert long_df['nvoxels'].tolist() == [900, 6543]
+        assert long_df['volume_mm3'].tolist() == [900.5, 6543.0]
+
+
+class TestRunFSStats:
+    """Test cases for running FSStats over several subjects."""
+
+    def test_run_fs_stats(self, tmp_path):
+        """Test that every subject gets its four output files."""
+        subjects_dir = tmp_path / 'subjects'
+        subject_ids = ['sub-01', 'sub-02']
+        for subject_id in subject_ids:
+            stats_dir = subjects_dir / subject_id / 'stats'
+            stats_dir.mkdir(parents=True)
+            (stats_dir / 'aseg.stats').write_text(ASEG_STATS)
+            for hemi in ('lh', 'rh'):
+                (stats_dir / f'{hemi}.aparc.pial.stats').write_text(APARC_PIAL_STATS)
+            scripts_dir = subjects_dir / subject_id / 'scripts'
+            scripts_dir.mkdir()
+            (scripts_dir / 'recon-all.log').write_text(RECON_ALL_LOG)
+
+        output_dir = tmp_path / 'out'
+        processed = run_fs_stats(subject_ids, subjects_dir, output_dir, n_jobs=1)
+
+        assert processed == subject_ids
+        for subject_id in subject_ids:
+            assert sorted(
+                path.name for path in (output_dir / subject_id).iterdir()
+            ) == [
+                f'{subject_id}_desc-FreeSurfer_qc.json',
+                f'{subject_id}_desc-FreeSurfer_qc.tsv',
+                f'{subject_id}_seg-FreeSurfer_morph.json',
+                f'{subject_id}_seg-FreeSurfer_morph.tsv',
+            ]
+        qc_df = pd.read_csv(
+            output_dir / 'sub-02' / 'sub-02_desc-FreeSurfer_qc.tsv', sep='\t'
+        )
+        assert qc_df['participant_id'].tolist() == ['sub-02']
+        assert qc_df['lh_euler'].tolist() == [-32]
+
+        header, row = (
+            (output_dir / 'sub-02' / 'sub-02_desc-FreeSurfer_qc.tsv')
+            .read_text()
+            .splitlines()
+        )
+        cells = dict(zip(header.split('\t'), row.split('\t'), strict=True))
+        assert cells.pop('participant_id') == 'sub-02'
+        assert cells.pop('session_id') == 'n/a'
+        # Every remaining cell is a plain number, not e.g. a numpy repr
+        assert {col: float(cell) for col, cell in cells.items()} == {
+            'lh_euler': -32.0,
+            'rh_euler': -28.0,
+            'lh_holes': 17.0,
+            'rh_holes': 15.0,
+            'cortex_numvert_lh': 150000.0,
+            'brainseg_brainsegvol_lh': 1188553.0,
+            'cortex_numvert_rh': 150000.0,
+            'brainseg_brainsegvol_rh': 1188553.0,
+            'brainseg_brainsegvol': 1188553.0,
+            'estimatedtotalintracranialvol_etiv': 1500000.5,
+        }
+
+    def test_run_region_stats(self, tmp_path):
+        """Test that every subject gets a table for every atlas."""
+        subjects_dir = tmp_path / 'subjects'
+        subject_ids = ['sub-01', 'sub-02']
+        atlases = ['Schaefer', 'aparc']
+        for subject_id in subject_ids:
+            stats_dir = subjects_dir / subject_id / 'stats'
+            stats_dir.mkdir(parents=True)
+            for atlas, hemi in product(atlases, ('lh', 'rh')):
+                (stats_dir / f'{hemi}.{atlas}.stats').write_text(SURF_STATS)
+                (stats_dir / f'{hemi}.{atlas}.g-w.pct.stats').write_text(GWR_STATS)
+
+        output_dir = tmp_path / 'out'
+        processed = run_region_stats(
+            subject_ids, atlases, subjects_dir, output_dir, n_jobs=1
+        )
+
+        assert processed == list(product(subject_ids, atlases))
+        for subject_id in subject_ids:
+            assert sorted(
+                path.name for path in (output_dir / subject_id).iterdir()
+            ) == [
+                f'{subject_id}_seg-Schaefer_surfacestats.tsv',
+                f'{subject_id}_seg-aparc_surfacestats.tsv',
+            ]
+        region_df = pd.read_csv(
+            output_dir / 'sub-02' / 'sub-02_seg-aparc_surfacestats.tsv', sep='\t'
+        )
+        assert region_df['participant_id'].unique().tolist() == ['sub-02']
+        assert region_df['numvert'].tolist() == [1000, 2000, 1000, 2000]
@@ -0,0 +1,205 @@
+"""Tests for freesurfer_post.workflows module."""
+
+import os
+
+import pytest
+
+from freesurfer_post import workflows
+from freesurfer_post.workflows import PARCSTATS_SHARED_INPUTS, build_workflow
+
+# Modification times, in ns, for files written before and after the surfaces
+OLD = 1_000_000_000_000_000_000
+SURFACES = 2_000_000_000_000_000_000
+NEW = 3_000_000_000_000_000_000
+
+
+def touch(path, mtime_ns=SURFACES):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def subject_dir(tmp_path, monkeypatch):
+    subject_dir = tmp_path / 'subjects' / 'sub-01'
+    for shared_input in PARCSTATS_SHARED_INPUTS:
+        touch(subject_dir / shared_input)
+    for hemi in ('lh', 'rh'):
+        touch(subject_dir / 'surf' / f'{hemi}.sphere.reg')
+        touch(subject_dir / 'surf' / f'{hemi}.w-g.pct.mgh')
+
+        fsaverage_annot = tmp_path / 'annots' / f'{hemi}.AAL.annot'
+        touch(fsaverage_annot)
+        monkeypatch.setitem(
+            workflows._FSAVERAGE_ANNOTS, (hemi, 'AAL'), str(fsaverage_annot)
+        )
+
+    return subject_dir
+
+
+def make_workflow(subject_dir, tmp_path, **kwargs):
+    return build_workflow(
+        'sub-01',
+        None,
+        subject_dir,
+        tmp_path / 'out',
+        tmp_path / 'work',
+        **kwargs,
+    )
+
+
+def interface_name(workflow, node_name):
+    return type(workflow.get_node(node_name).interface).__name__
+
+
+def write_stats(subject_dir, hemi, parc_name, mtime_ns):
+    touch(subject_dir / 'stats' / f'{hemi}.{parc_name}.stats', mtime_ns)
+    touch(subject_dir / 'stats' / f'{hemi}.{parc_name}.g-w.pct.stats', mtime_ns)
+
+
+class TestReuseExisting:
+    """Test cases for reusing the outputs of a previous run."""
+
+    def test_reuse_disabled_by_default(self, subject_dir, tmp_path):
+        """Test that existing outputs are recomputed unless reuse is requested."""
+        write_stats(subject_dir, 'lh', 'aparc', NEW)
+
+        workflow = make_workflow(subject_dir, tmp_path, atlases=['aparc'])
+
+        assert interface_name(workflow, 'lh_aparc_parcstats') == 'ParcellationStats'
+        assert interface_name(workflow, 'lh_aparc_gwr_segstats') == 'SegStats'
+
+    def test_reuse_fresh_stats(self, subject_dir, tmp_path):
+        """Test that outputs newer than the surfaces are passed through."""
+        write_stats(subject_dir, 'lh', 'aparc', NEW)
+
+        workflow = make_workflow(
+            subject_dir, tmp_path, atlases=['aparc'], reuse_existing=True
+        )
+
+        assert interface_name(workflow, 'lh_aparc_parcstats') == 'IdentityInterface'
+        assert interface_name(workflow, 'lh_aparc_gwr_segstats') == 'IdentityInterface'
+        assert workflow.get_node('lh_aparc_transform') is None
+        assert interface_name(workflow, 'rh_aparc_parcstats') == 'ParcellationStats'
+
+    def test_reuse_stale_stats(self, subject_dir, tmp_path):
+        """Test that outputs older than the surfaces are recomputed."""
+        write_stats(subject_dir, 'lh', 'aparc', OLD)
+
+        workflow = make_workflow(
+            subject_dir, tmp_path, atlases=['aparc'], reuse_existing=True
+        )
+
+        assert interface_name(workflow, 'lh_aparc_parcstats') == 'ParcellationStats'
+
+    def test_reuse_partially_stale_stats(self, subject_dir, tmp_path):
+        """Test that a fresh table is not combined with a stale g-w.pct summary."""
+        write_stats(subject_dir, 'lh', 'aparc', OLD)
+        touch(subject_dir / 'stats' / 'lh.aparc.stats', NEW)
+
+        workflow = make_workflow(
+            subject_dir, tmp_path, atlases=['aparc'], reuse_existing=True
+        )
+
+        assert interface_name(workflow, 'lh_aparc_parcstats') == 'ParcellationStats'
+        assert interface_name(workflow, 'lh_aparc_gwr_segstats') == 'SegStats'
+
+    def test_reuse_warped_annot(self, subject_dir, tmp_path):
+        """Test that only a fresh warped annot skips SurfaceTransform."""
+        touch(subject_dir / 'label' / 'lh.AAL.annot', NEW)
+        touch(subject_dir / 'label' / 'rh.AAL.annot', OLD)
+
+        workflow = make_workflow(
+            subject_dir, tmp_path, atlases=['AAL'], reuse_existing=True
+        )
+
+        assert interface_name(workflow, 'lh_AAL_transform') == 'IdentityInterface'
+        assert interface_name(workflow, 'rh_AAL_transform') == 'SurfaceTransform'
+
+
+class TestWarmPageCache:
+    """Test cases for the node that warms the page cache."""
+
+    def test_warm_page_cache_feeds_parcstats(self, subject_dir, tmp_path):
+        """Test that the parcstats nodes wait for the shared inputs to be read."""
+        workflow = make_workflow(subject_dir, tmp_path, atlases=['aparc'])
+
+        warm_page_cache = workflow.get_node('warm_page_cache')
+        assert len(warm_page_cache.inputs.in_files) == len(PARCSTATS_SHARED_INPUTS)
+        assert {node.name for node in workflow._graph.successors(warm_page_cache)} == {
+            'lh_aparc_parcstats',
+            'rh_aparc_parcstats',
+        }
+
+    def test_no_warm_page_cache_without_parcstats(self, subject_dir, tmp_path):
+        """Test that nothing is read when every parcstats output is reused."""
+        write_stats(subject_dir, 'lh', 'aparc', NEW)
+        write_stats(subject_dir, 'rh', 'aparc', NEW)
+        # Not needed by anything once the stats are reused
+        (subject_dir / 'mri' / 'ribbon.mgz').unlink()
+
+        workflow = make_workflow(
+            subject_dir, tmp_path, atlases=['aparc'], reuse_existing=True
+        )
+
+        assert workflow.get_node('warm_page_cache') is None
+
+
+class TestAtlases:
+    """Test cases for selecting a subset of the parcellations."""
+
+    @staticmethod
+    def collect_stats_nodes(workflow):
+        return [
+            node_name
+            for node_name in workflow.list_node_names()
+            if node_name.endswith('_collect_stats')
+        ]
+
+    def test_atlases_subset(self, subject_dir, tmp_path):
+        """Test that only the requested parcellations get nodes."""
+        workflow = make_workflow(subject_dir, tmp_path, atlases=['aparc', 'AAL'])
+
+        assert sorted(self.collect_stats_nodes(workflow)) == [
+            'AAL_collect_stats',
+            'aparc_collect_stats',
+        ]
+        assert workflow.get_node('lh_aparcDKTatlas_parcstats') is None
+
+    def test_atlases_unknown(self, subject_dir, tmp_path):
+        """Test that unknown atlas names are rejected."""
+        with pytest.raises(ValueError, match='Unknown atlases: nope'):
+            make_workflow(subject_dir, tmp_path, atlases=['aparc', 'nope'])
+
+    def test_atlases_str(self, subject_dir, tmp_path):
+        """Test that a bare string is not treated as a list of atlases."""
+        with pytest.raises(TypeError, match='not a str'):
+            make_workflow(subject_dir, tmp_path, atlases='aparc')
+
+
+class TestOmpNthreads:
+    """Test cases for the OpenMP thread count."""
+
+    def test_omp_nthreads(self, subject_dir, tmp_path):
+        """Test that the thread count reaches the FreeSurfer commands."""
+        workflow = make_workflow(subject_dir, tmp_path, atlases=['AAL'], omp_nthreads=4)
+
+        for node_name in ('lh_AAL_transform', 'lh_AAL_parcstats'):
+            node = workflow.get_node(node_name)
+            assert node.n_procs == 4
+            assert node.inputs.environ == {'OMP_NUM_THREADS': '4'}
+
+    def test_omp_nthreads_invalid(self, subject_dir, tmp_path):
+        """Test that fewer than one thread is rejected."""
+        with pytest.raises(ValueError, match='at least 1'):
+            make_workflow(subject_dir, tmp_path, omp_nthreads=0)
+
+
+class TestSurfStatsMetadataNode:
+    """Test cases for the surface stats metadata node."""
+
+    def test_surf_stats_metadata_always_runs(self, subject_dir, tmp_path):
+        """Test that the sidecar is rewritten even if nipype has a cached result."""
+        workflow = make_workflow(subject_dir, tmp_path, atlases=['aparc'])
+
+        assert workflow.get_node('surf_stats_metadata').overwrite is True